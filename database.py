@@ -5,7 +5,8 @@ MongoDB helper functions ready to use in your backend code.
 Import and use these functions in your API endpoints for database operations.
 """
 
-from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import WriteConcern
 from datetime import datetime, timezone
 import os
 from dotenv import load_dotenv
@@ -21,12 +22,37 @@ db = None
 database_url = os.getenv("DATABASE_URL")
 database_name = os.getenv("DATABASE_NAME")
 
+# One client per process; Motor pools connections internally, so never
+# construct a client per request. Motor still runs some work on a thread
+# pool, sized via the MOTOR_MAX_WORKERS env var - keep it modest.
+# Pool sizes are per worker process, so keep them small and scale via workers.
+# No socketTimeoutMS: it would also cut long index builds and streamed cursors
+# mid-response; request-path reads bound themselves with QUERY_TIMEOUT_MS instead.
 if database_url and database_name:
-    _client = MongoClient(database_url)
+    _client = AsyncIOMotorClient(
+        database_url,
+        maxPoolSize=int(os.getenv("MONGO_MAX_POOL_SIZE", "50")),
+        minPoolSize=int(os.getenv("MONGO_MIN_POOL_SIZE", "0")),
+        serverSelectionTimeoutMS=2000,
+        retryWrites=True,
+        # Wire compression; zstd needs the zstandard package, zlib is the stdlib fallback.
+        compressors="zstd,zlib",
+    )
     db = _client[database_name]
 
+# Server-side time limit (maxTimeMS) for short reads on the request path.
+QUERY_TIMEOUT_MS = 5000
+
+# Catalog data (products, categories) is re-editable by admins, so a primary
+# ack without waiting on the journal is enough. Orders keep the server default.
+CATALOG_WRITE_CONCERN = WriteConcern(w=1, j=False)
+
+def catalog_collection(collection_name: str):
+    """Collection handle using CATALOG_WRITE_CONCERN for writes"""
+    return db.get_collection(collection_name, write_concern=CATALOG_WRITE_CONCERN)
+
 # Helper functions for common database operations
-def create_document(collection_name: str, data: Union[BaseModel, dict]):
+async def create_document(collection_name: str, data: Union[BaseModel, dict]):
     """Insert a single document with timestamp"""
     if db is None:
         raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
@@ -37,13 +63,14 @@ def create_document(collection_name: str, data: Union[BaseModel, dict]):
     else:
         data_dict = data.copy()
 
-    data_dict['created_at'] = datetime.now(timezone.utc)
-    data_dict['updated_at'] = datetime.now(timezone.utc)
+    now = datetime.now(timezone.utc)
+    data_dict['created_at'] = now
+    data_dict['updated_at'] = now
 
-    result = db[collection_name].insert_one(data_dict)
+    result = await db[collection_name].insert_one(data_dict)
     return str(result.inserted_id)
 
-def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None):
+async def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None):
     """Get documents from collection"""
     if db is None:
         raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
@@ -52,4 +79,4 @@ def get_documents(collection_name: str, filter_dict: dict = None, limit: int = N
     if limit:
         cursor = cursor.limit(limit)
     
-    return list(cursor)
+    return await cursor.to_list(length=limit)
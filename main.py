@@ -1,17 +1,92 @@
+import asyncio
+import logging
 import os
-from datetime import datetime, timedelta, timezone
-from typing import List, Optional
+import re
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import List, Literal, Optional
+import orjson
 from bson import ObjectId
-from fastapi import FastAPI, HTTPException, Depends, Query, Header
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, ConnectionFailure, DuplicateKeyError, PyMongoError
+from fastapi import FastAPI, HTTPException, Body, Depends, Query, Header, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, TypeAdapter
+import hashlib
 from hashlib import sha256
+import hmac
 import secrets
+from cachetools import TTLCache
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
 
-from database import db
+from database import QUERY_TIMEOUT_MS, catalog_collection, db
 from schemas import Category, Product, Order, AdminUser
 
-app = FastAPI(title="Handestiy API")
+logger = logging.getLogger(__name__)
+
+# ---------------------- JSON encoding ----------------------
+# Mongo returns ObjectIds and naive UTC datetimes; orjson handles both in C.
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_NAIVE_UTC
+
+def orjson_default(o):
+    if isinstance(o, ObjectId):
+        return str(o)
+    raise TypeError
+
+def dumps(content) -> bytes:
+    return orjson.dumps(content, default=orjson_default, option=ORJSON_OPTIONS)
+
+class MongoJSONResponse(ORJSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+# ---------------------- Indexes ----------------------
+# Compound indexes follow the Equality, Sort, Range rule so listing sorts are
+# served from the index instead of an in-memory sort. Query shapes they back:
+#   product: {active} or {active, category} sorted by created_at desc or price;
+#            the unfiltered listing needs its own indexes because without an
+#            equality match on category the (active, category, ...) ones can't
+#            provide the sort. _id is the keyset pagination tiebreaker.
+#   order:   {status} or {} sorted by created_at desc, the unfiltered admin list
+#            using its own created_at index; prefix search on customer.name/email
+#   adminuser: lookup by current_token.token
+INDEXES = [
+    ("product", [("active", 1), ("category", 1), ("created_at", -1), ("_id", -1)], {}),
+    ("product", [("active", 1), ("category", 1), ("price", 1), ("_id", 1)], {}),
+    ("product", [("active", 1), ("created_at", -1), ("_id", -1)], {}),
+    ("product", [("active", 1), ("price", 1), ("_id", 1)], {}),
+    ("product", [("slug", 1)], {"unique": True}),
+    ("category", [("slug", 1)], {"unique": True}),
+    ("order", [("status", 1), ("created_at", -1)], {}),
+    ("order", [("created_at", -1)], {}),
+    ("order", [("customer.email", 1)], {}),
+    ("order", [("customer.name", 1)], {}),
+    ("adminuser", [("current_token.token", 1)], {}),
+]
+
+async def ensure_indexes():
+    """Best-effort index creation; failures are logged so the app still boots (see /test)."""
+    if db is None:
+        return
+    for collection_name, keys, options in INDEXES:
+        try:
+            await db[collection_name].create_index(keys, **options)
+        except ConnectionFailure as e:
+            logger.warning("Skipping index creation, database unreachable: %s", e)
+            return
+        except PyMongoError as e:
+            # e.g. duplicate slugs left behind before the unique index existed
+            logger.warning("Could not create index %s on %s: %s", keys, collection_name, e)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await ensure_indexes()
+    yield
+
+app = FastAPI(title="Handestiy API", default_response_class=MongoJSONResponse, lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -22,31 +97,83 @@ app.add_middleware(
 )
 
 # ---------------------- Helpers ----------------------
+_UTC = timezone.utc
+TOKEN_TTL_MS = 8 * 60 * 60 * 1000
+
+def _now_ms() -> int:
+    """Current Unix time in integer milliseconds, the unit of current_token.expires_at."""
+    return time.time_ns() // 1_000_000
+
+_password_hasher = PasswordHasher()
 
 def hash_password(password: str) -> str:
-    return sha256(password.encode()).hexdigest()
+    return _password_hasher.hash(password)
+
+def verify_password(stored: str, password: str) -> bool:
+    if not stored:
+        return False
+    if not stored.startswith("$argon2"):
+        # Legacy unsalted sha256 hex rows; re-hashed on the next successful login.
+        return hmac.compare_digest(stored, sha256(password.encode()).hexdigest())
+    try:
+        return _password_hasher.verify(stored, password)
+    except (VerificationError, InvalidHashError):
+        return False
+
+def password_needs_rehash(stored: str) -> bool:
+    return not stored.startswith("$argon2") or _password_hasher.check_needs_rehash(stored)
+
+def make_etag(body: bytes) -> str:
+    return f'"{hashlib.md5(body).hexdigest()}"'
+
+def etag_matches(etag: str, if_none_match: Optional[str]) -> bool:
+    if not if_none_match:
+        return False
+    return if_none_match.strip() == "*" or etag in (t.strip() for t in if_none_match.split(","))
+
+def cached_json_response(body: bytes, etag: str, if_none_match: Optional[str], cache_control: str) -> Response:
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(etag, if_none_match):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def object_id(doc_id: str) -> ObjectId:
+    """Path dependency turning ``{doc_id}`` into an ObjectId, or a 400."""
+    if not ObjectId.is_valid(doc_id):
+        raise HTTPException(status_code=400, detail="Invalid ID")
+    return ObjectId(doc_id)
+
+# Built once so write handlers reuse the compiled serializers.
+_CATEGORY_TA = TypeAdapter(Category)
+_PRODUCT_TA = TypeAdapter(Product)
+_ORDER_TA = TypeAdapter(Order)
 
 class TokenInfo(BaseModel):
     token: str
     expires_at: datetime
 
 # ---------------------- Schema endpoint ----------------------
+# The models only change between deploys, so the schema is built once at import.
+_SCHEMA = {
+    "category": Category.model_json_schema(),
+    "product": Product.model_json_schema(),
+    "order": Order.model_json_schema(),
+    "adminuser": AdminUser.model_json_schema(),
+}
+_SCHEMA_BODY = dumps(_SCHEMA)
+_SCHEMA_ETAG = make_etag(_SCHEMA_BODY)
+
 @app.get("/schema")
-def get_schema():
-    return {
-        "category": Category.model_json_schema(),
-        "product": Product.model_json_schema(),
-        "order": Order.model_json_schema(),
-        "adminuser": AdminUser.model_json_schema(),
-    }
+async def get_schema(if_none_match: Optional[str] = Header(default=None)):
+    return cached_json_response(_SCHEMA_BODY, _SCHEMA_ETAG, if_none_match, "public, max-age=300")
 
 # ---------------------- Health ----------------------
 @app.get("/")
-def root():
+async def root():
     return {"brand": "Handestiy", "status": "ok"}
 
 @app.get("/test")
-def test_database():
+async def test_database():
     response = {
         "backend": "✅ Running",
         "database": "❌ Not Available",
@@ -59,27 +186,38 @@ def test_database():
             response["database"] = "❌ Not Connected"
         else:
             response["database"] = "✅ Connected"
-            response["collections"] = db.list_collection_names()
+            response["collections"] = await db.list_collection_names()
     except Exception as e:
         response["database"] = f"⚠️ Error: {str(e)[:120]}"
     return response
 
 # ---------------------- Auth utils ----------------------
 
-def get_admin_by_token(token: str) -> Optional[dict]:
+# Validated token -> admin document. Per-process; each worker warms its own copy.
+# Entries live at most 60s, and expiry is re-checked on every hit.
+_TOKEN_CACHE: TTLCache = TTLCache(maxsize=1024, ttl=60)
+
+async def get_admin_by_token(token: str) -> Optional[dict]:
     if not token:
         return None
-    admin = db["adminuser"].find_one({"current_token.token": token})
-    if admin and admin.get("current_token", {}).get("expires_at"):
-        if datetime.now(timezone.utc) > admin["current_token"]["expires_at"]:
+    admin = _TOKEN_CACHE.get(token)
+    if admin is None:
+        admin = await db["adminuser"].find_one({"current_token.token": token}, max_time_ms=QUERY_TIMEOUT_MS)
+        if not admin:
             return None
+        _TOKEN_CACHE[token] = admin
+    # expires_at is Unix epoch ms; rows from before that change hold a datetime and count as expired.
+    expires_at = admin.get("current_token", {}).get("expires_at")
+    if not isinstance(expires_at, int) or _now_ms() > expires_at:
+        _TOKEN_CACHE.pop(token, None)
+        return None
     return admin
 
 async def require_admin(authorization: Optional[str] = Header(default=None)):
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Unauthorized")
     token = authorization.split(" ", 1)[1]
-    admin = get_admin_by_token(token)
+    admin = await get_admin_by_token(token)
     if not admin:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
     return admin
@@ -90,14 +228,14 @@ class SeedAdminBody(BaseModel):
     password: str
 
 @app.post("/api/admin/seed")
-def seed_admin(body: SeedAdminBody):
-    existing = db["adminuser"].find_one({"email": body.email})
+async def seed_admin(body: SeedAdminBody):
+    existing = await db["adminuser"].find_one({"email": body.email}, max_time_ms=QUERY_TIMEOUT_MS)
     if existing:
         raise HTTPException(status_code=400, detail="Admin already exists")
-    db["adminuser"].insert_one({
+    await db["adminuser"].insert_one({
         "email": body.email,
-        "password": hash_password(body.password),
-        "created_at": datetime.now(timezone.utc)
+        "password": await asyncio.to_thread(hash_password, body.password),
+        "created_at": datetime.now(_UTC)
     })
     return {"created": True}
 
@@ -106,171 +244,346 @@ class LoginBody(BaseModel):
     email: str
     password: str
 
+# (email, client ip) -> failed attempts; an entry expires 15 minutes after its last failure.
+# The counter is per worker process. The client ip is the peer address, which
+# uvicorn rewrites from X-Forwarded-For only for proxies in --forwarded-allow-ips
+# (see start_server.sh), so a proxy's own address doesn't lock out every user.
+MAX_LOGIN_FAILURES = 5
+_LOGIN_FAILURES: TTLCache = TTLCache(maxsize=10_000, ttl=15 * 60)
+
+# Verified against when the email is unknown, so both paths cost one KDF run.
+_DUMMY_PASSWORD_HASH = hash_password(secrets.token_hex(16))
+
 @app.post("/api/admin/login", response_model=TokenInfo)
-def admin_login(body: LoginBody):
-    admin = db["adminuser"].find_one({"email": body.email})
-    if not admin or admin.get("password") != hash_password(body.password):
+async def admin_login(body: LoginBody, request: Request):
+    attempt_key = (body.email, request.client.host if request.client else None)
+    attempts = _LOGIN_FAILURES.get(attempt_key, 0) + 1
+    if attempts > MAX_LOGIN_FAILURES:
+        raise HTTPException(status_code=429, detail="Too many failed login attempts, try again later")
+    # Counted before any await so concurrent attempts can't all pass the check
+    # on the same stale count; a successful login clears it below.
+    _LOGIN_FAILURES[attempt_key] = attempts
+    admin = await db["adminuser"].find_one({"email": body.email}, max_time_ms=QUERY_TIMEOUT_MS)
+    stored = admin.get("password", "") if admin else _DUMMY_PASSWORD_HASH
+    # KDF work runs off the event loop so a login doesn't stall other requests.
+    if not await asyncio.to_thread(verify_password, stored, body.password) or not admin:
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    _LOGIN_FAILURES.pop(attempt_key, None)
     token = secrets.token_hex(24)
-    expires_at = datetime.now(timezone.utc) + timedelta(hours=8)
-    db["adminuser"].update_one({"_id": admin["_id"]}, {"$set": {"current_token": {"token": token, "expires_at": expires_at}}})
-    return TokenInfo(token=token, expires_at=expires_at)
+    expires_ms = _now_ms() + TOKEN_TTL_MS
+    update = {"current_token": {"token": token, "expires_at": expires_ms}}
+    if password_needs_rehash(stored):
+        update["password"] = await asyncio.to_thread(hash_password, body.password)
+    await db["adminuser"].update_one({"_id": admin["_id"]}, {"$set": update})
+    # The previous token is overwritten in Mongo; drop it here too.
+    _TOKEN_CACHE.pop(admin.get("current_token", {}).get("token"), None)
+    return TokenInfo(token=token, expires_at=datetime.fromtimestamp(expires_ms / 1000, _UTC))
 
 # ---------------------- Categories ----------------------
+# active flag -> (encoded body, ETag). Cleared by every category write.
+_CATEGORY_CACHE: TTLCache = TTLCache(maxsize=4, ttl=30)
+
 @app.get("/api/categories")
-def list_categories(active: Optional[bool] = Query(default=True)):
-    q = {"active": True} if active else {}
-    cats = list(db["category"].find(q).sort("name", 1))
-    for c in cats:
-        c["_id"] = str(c["_id"])
-    return cats
+async def list_categories(
+    active: Optional[bool] = Query(default=True),
+    if_none_match: Optional[str] = Header(default=None),
+):
+    key = bool(active)
+    cached = _CATEGORY_CACHE.get(key)
+    if cached is None:
+        q = {"active": True} if active else {}
+        cats = await db["category"].find(q).sort("name", 1).max_time_ms(QUERY_TIMEOUT_MS).to_list(length=None)
+        body = dumps(cats)
+        cached = _CATEGORY_CACHE[key] = (body, make_etag(body))
+    body, etag = cached
+    # no-cache: clients always revalidate, so admin edits show up immediately.
+    return cached_json_response(body, etag, if_none_match, "no-cache")
 
 class CategoryUpsert(Category):
     pass
 
 @app.post("/api/admin/categories")
-def create_category(body: CategoryUpsert, admin=Depends(require_admin)):
-    if db["category"].find_one({"slug": body.slug}):
+async def create_category(body: CategoryUpsert, admin=Depends(require_admin)):
+    data = _CATEGORY_TA.dump_python(body)
+    data["created_at"] = datetime.now(_UTC)
+    try:
+        res = await catalog_collection("category").insert_one(data)
+    except DuplicateKeyError:
         raise HTTPException(status_code=400, detail="Slug already exists")
-    res = db["category"].insert_one({**body.model_dump(), "created_at": datetime.now(timezone.utc)})
+    _CATEGORY_CACHE.clear()
     return {"_id": str(res.inserted_id)}
 
-@app.put("/api/admin/categories/{cat_id}")
-def update_category(cat_id: str, body: CategoryUpsert, admin=Depends(require_admin)):
+@app.put("/api/admin/categories/{doc_id}")
+async def update_category(body: CategoryUpsert, admin=Depends(require_admin), _id: ObjectId = Depends(object_id)):
     try:
-        _id = ObjectId(cat_id)
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid ID")
-    db["category"].update_one({"_id": _id}, {"$set": body.model_dump()})
+        await catalog_collection("category").update_one({"_id": _id}, {"$set": _CATEGORY_TA.dump_python(body)})
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Slug already exists")
+    _CATEGORY_CACHE.clear()
     return {"updated": True}
 
-@app.delete("/api/admin/categories/{cat_id}")
-def delete_category(cat_id: str, admin=Depends(require_admin)):
-    try:
-        _id = ObjectId(cat_id)
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid ID")
-    db["category"].delete_one({"_id": _id})
+@app.delete("/api/admin/categories/{doc_id}")
+async def delete_category(admin=Depends(require_admin), _id: ObjectId = Depends(object_id)):
+    await catalog_collection("category").delete_one({"_id": _id})
+    _CATEGORY_CACHE.clear()
     return {"deleted": True}
 
 # ---------------------- Products ----------------------
+# Fields needed to render a product card in listings; detail pages fetch the full document.
+PRODUCT_CARD_PROJECTION = {
+    "title": 1,
+    "slug": 1,
+    "price": 1,
+    "discount_price": 1,
+    "images": {"$slice": 1},
+    "category": 1,
+    "created_at": 1,
+}
+
+ProductSort = Literal["price_asc", "price_desc", "newest"]
+
+# sort param -> (field, direction); each pair is backed by a product listing index.
+PRODUCT_SORTS = {
+    "price_asc": ("price", 1),
+    "price_desc": ("price", -1),
+    "newest": ("created_at", -1),
+}
+
+# Products missing the sort field are encoded as "null". Mongo sorts null/missing
+# lowest: first for ascending sorts, last for descending ones.
+_NULL_CURSOR_KEY = "null"
+
+def encode_product_cursor(p: dict, field: str) -> str:
+    value = p.get(field)
+    if value is None:
+        value = _NULL_CURSOR_KEY
+    elif isinstance(value, datetime):
+        value = value.isoformat()
+    else:
+        value = repr(value)
+    return f"{value}|{p['_id']}"
+
+def decode_product_cursor(after: str, field: str):
+    value, _, raw_id = after.rpartition("|")
+    if not ObjectId.is_valid(raw_id):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if value == _NULL_CURSOR_KEY:
+        return None, ObjectId(raw_id)
+    try:
+        key = datetime.fromisoformat(value) if field == "created_at" else float(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return key, ObjectId(raw_id)
+
+def product_keyset_filter(field: str, direction: int, key, last_id: ObjectId) -> dict:
+    """Match rows strictly after (key, last_id) in (field, _id) sort order."""
+    op = "$gt" if direction == 1 else "$lt"
+    if key is None:
+        branches = [{field: None, "_id": {op: last_id}}]
+        if direction == 1:
+            # Ascending: every non-null value sorts after the null block.
+            branches.append({field: {"$ne": None}})
+    else:
+        branches = [{field: {op: key}}, {field: key, "_id": {op: last_id}}]
+        if direction == -1:
+            # Descending: the null block comes after every non-null value.
+            branches.append({field: None})
+    return {"$or": branches}
+
 @app.get("/api/products")
-def list_products(
+async def list_products(
     category: Optional[str] = None,
-    sort: Optional[str] = Query(default="newest"),
-    page: int = 1,
-    limit: int = 12,
+    sort: ProductSort = Query(default="newest"),
+    after: Optional[str] = None,
+    page: int = Query(default=1, ge=1, deprecated=True, description="Offset paging; prefer `after`"),
+    limit: int = Query(default=12, ge=1),
 ):
     q = {"active": True}
     if category and category != "All":
         q["category"] = category
-    cursor = db["product"].find(q)
-    if sort == "price_asc":
-        cursor = cursor.sort("price", 1)
-    elif sort == "price_desc":
-        cursor = cursor.sort("price", -1)
-    else:  # newest
-        cursor = cursor.sort("created_at", -1)
-    total = cursor.count() if hasattr(cursor, 'count') else db["product"].count_documents(q)
-    cursor = cursor.skip((page-1)*limit).limit(limit)
-    items = []
-    for p in cursor:
-        p["_id"] = str(p["_id"])
-        items.append(p)
-    return {"items": items, "total": total, "page": page, "limit": limit}
+    field, direction = PRODUCT_SORTS[sort]
+    find_q = q
+    if after:
+        # Keyset pagination: resume strictly after the last seen (sort key, _id).
+        key, last_id = decode_product_cursor(after, field)
+        find_q = {**q, **product_keyset_filter(field, direction, key, last_id)}
+    cursor = db["product"].find(find_q, projection=PRODUCT_CARD_PROJECTION).max_time_ms(QUERY_TIMEOUT_MS)
+    cursor = cursor.sort([(field, direction), ("_id", direction)])
+    if not after:
+        cursor = cursor.skip((page-1)*limit)
+    # Fetch one extra row to learn whether another page exists instead of counting matches.
+    cursor = cursor.limit(limit + 1)
+    items = await cursor.to_list(length=limit + 1)
+    has_more = len(items) > limit
+    del items[limit:]
+    next_cursor = encode_product_cursor(items[-1], field) if has_more else None
+    # Returned as a response directly so ObjectIds are stringified by orjson, not a Python loop.
+    body = {"items": items, "has_more": has_more, "limit": limit, "next_cursor": next_cursor}
+    if not after:
+        # page only means something for offset paging.
+        body["page"] = page
+    return MongoJSONResponse(body)
 
 @app.get("/api/products/{slug}")
-def get_product_by_slug(slug: str):
-    p = db["product"].find_one({"slug": slug, "active": True})
+async def get_product_by_slug(slug: str):
+    p = await db["product"].find_one({"slug": slug, "active": True}, max_time_ms=QUERY_TIMEOUT_MS)
     if not p:
         raise HTTPException(status_code=404, detail="Product not found")
-    p["_id"] = str(p["_id"])
-    return p
+    return MongoJSONResponse(p)
 
-@app.get("/api/products/id/{pid}")
-def get_product_by_id(pid: str):
-    try:
-        _id = ObjectId(pid)
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid ID")
-    p = db["product"].find_one({"_id": _id})
+@app.get("/api/products/id/{doc_id}")
+async def get_product_by_id(_id: ObjectId = Depends(object_id)):
+    p = await db["product"].find_one({"_id": _id}, max_time_ms=QUERY_TIMEOUT_MS)
     if not p:
         raise HTTPException(status_code=404, detail="Product not found")
-    p["_id"] = str(p["_id"])
-    return p
+    return MongoJSONResponse(p)
 
 class ProductUpsert(Product):
     pass
 
 @app.post("/api/admin/products")
-def create_product(body: ProductUpsert, admin=Depends(require_admin)):
-    if db["product"].find_one({"slug": body.slug}):
+async def create_product(body: ProductUpsert, admin=Depends(require_admin)):
+    data = _PRODUCT_TA.dump_python(body)
+    data["created_at"] = datetime.now(_UTC)
+    try:
+        res = await catalog_collection("product").insert_one(data)
+    except DuplicateKeyError:
         raise HTTPException(status_code=400, detail="Slug already exists")
-    res = db["product"].insert_one({**body.model_dump(), "created_at": datetime.now(timezone.utc)})
     return {"_id": str(res.inserted_id)}
 
-@app.put("/api/admin/products/{pid}")
-def update_product(pid: str, body: ProductUpsert, admin=Depends(require_admin)):
+MAX_BULK_PRODUCTS = 500
+
+@app.post("/api/admin/products/bulk")
+async def bulk_upsert_products(
+    body: List[ProductUpsert] = Body(max_length=MAX_BULK_PRODUCTS),
+    admin=Depends(require_admin),
+):
+    if not body:
+        return {"matched": 0, "modified": 0, "upserted": 0}
+    now = datetime.now(_UTC)
+    ops = [
+        UpdateOne({"slug": p.slug}, {"$set": _PRODUCT_TA.dump_python(p), "$setOnInsert": {"created_at": now}}, upsert=True)
+        for p in body
+    ]
     try:
-        _id = ObjectId(pid)
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid ID")
-    db["product"].update_one({"_id": _id}, {"$set": body.model_dump()})
+        res = await catalog_collection("product").bulk_write(ops, ordered=False)
+    except BulkWriteError as e:
+        # Concurrent upserts of the same new slug race on the unique index.
+        # Writes are unordered, so the rest of the batch was still applied.
+        write_errors = e.details.get("writeErrors", [])
+        duplicate_slugs_only = (
+            write_errors
+            and not e.details.get("writeConcernErrors")
+            and all(err.get("code") == 11000 for err in write_errors)
+        )
+        if not duplicate_slugs_only:
+            raise
+        raise HTTPException(status_code=400, detail={
+            "message": "Slug already exists",
+            "matched": e.details.get("nMatched", 0),
+            "modified": e.details.get("nModified", 0),
+            "upserted": e.details.get("nUpserted", 0),
+            "failed": len(write_errors),
+        })
+    return {"matched": res.matched_count, "modified": res.modified_count, "upserted": res.upserted_count}
+
+@app.put("/api/admin/products/{doc_id}")
+async def update_product(body: ProductUpsert, admin=Depends(require_admin), _id: ObjectId = Depends(object_id)):
+    try:
+        await catalog_collection("product").update_one({"_id": _id}, {"$set": _PRODUCT_TA.dump_python(body)})
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Slug already exists")
     return {"updated": True}
 
-@app.delete("/api/admin/products/{pid}")
-def delete_product(pid: str, admin=Depends(require_admin)):
-    try:
-        _id = ObjectId(pid)
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid ID")
-    db["product"].delete_one({"_id": _id})
+@app.delete("/api/admin/products/{doc_id}")
+async def delete_product(admin=Depends(require_admin), _id: ObjectId = Depends(object_id)):
+    await catalog_collection("product").delete_one({"_id": _id})
     return {"deleted": True}
 
 # ---------------------- Orders ----------------------
 @app.post("/api/orders")
-def create_order(order: Order):
-    data = order.model_dump()
-    data["created_at"] = datetime.now(timezone.utc)
-    res = db["order"].insert_one(data)
+async def create_order(order: Order):
+    data = _ORDER_TA.dump_python(order)
+    data["created_at"] = datetime.now(_UTC)
+    res = await db["order"].insert_one(data)
     return {"order_id": str(res.inserted_id)}
 
-@app.get("/api/orders/{oid}")
-def get_order(oid: str):
-    try:
-        _id = ObjectId(oid)
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid ID")
-    o = db["order"].find_one({"_id": _id})
-    if not o:
+@app.get("/api/orders/{doc_id}")
+async def get_order(_id: ObjectId = Depends(object_id)):
+    # Resolve the current product card for every line item in the same round-trip.
+    # items.product_id is stored as a string, so convert it before joining on _id.
+    pipeline = [
+        {"$match": {"_id": _id}},
+        {"$addFields": {"_product_ids": {"$map": {
+            "input": "$items.product_id",
+            "as": "pid",
+            "in": {"$convert": {"input": "$$pid", "to": "objectId", "onError": None, "onNull": None}},
+        }}}},
+        {"$lookup": {
+            "from": "product",
+            "localField": "_product_ids",
+            "foreignField": "_id",
+            "pipeline": [{"$project": {"title": 1, "slug": 1, "images": {"$slice": ["$images", 1]}}}],
+            "as": "_products",
+        }},
+        {"$project": {"_product_ids": 0}},
+    ]
+    docs = await db["order"].aggregate(pipeline, maxTimeMS=QUERY_TIMEOUT_MS).to_list(length=1)
+    if not docs:
         raise HTTPException(status_code=404, detail="Order not found")
-    o["_id"] = str(o["_id"])
-    return o
+    o = docs[0]
+    products = {str(p.pop("_id")): p for p in o.pop("_products", [])}
+    for item in o.get("items", []):
+        item["product"] = products.get(item.get("product_id"))
+    return MongoJSONResponse(o)
+
+# Columns shown in the admin order list.
+ORDER_LIST_PROJECTION = {"status": 1, "total": 1, "customer.name": 1, "created_at": 1}
 
 @app.get("/api/admin/orders")
-def list_orders(status: Optional[str] = None, search: Optional[str] = None, admin=Depends(require_admin)):
+async def list_orders(status: Optional[str] = None, search: Optional[str] = None, admin=Depends(require_admin)):
     q = {}
     if status:
         q["status"] = status
     if search:
+        # Escaped, anchored prefix match. Because it is case-insensitive Mongo
+        # can't narrow the index bounds: each branch scans its whole index,
+        # which is cheaper than a collection scan but not an index seek.
+        prefix = f"^{re.escape(search)}"
         q["$or"] = [
-            {"customer.name": {"$regex": search, "$options": "i"}},
-            {"customer.email": {"$regex": search, "$options": "i"}},
+            {"customer.name": {"$regex": prefix, "$options": "i"}},
+            {"customer.email": {"$regex": prefix, "$options": "i"}},
         ]
-    items = []
-    for o in db["order"].find(q).sort("created_at", -1):
-        o["_id"] = str(o["_id"])
-        items.append(o)
-    return items
+
+    # No maxTimeMS here: it is cumulative across getMores and would cut a long
+    # export off after the 200 status and first lines have already been sent.
+    cursor = db["order"].find(q, projection=ORDER_LIST_PROJECTION).sort("created_at", -1).batch_size(200)
+    # Pull the first batch before committing to a 200 so query/sort failures
+    # still surface as a proper error status rather than an empty stream.
+    try:
+        first_batch = await cursor.to_list(length=200)
+    except PyMongoError:
+        logger.exception("Order list query failed")
+        raise HTTPException(status_code=503, detail="Could not load orders")
+
+    async def stream():
+        for o in first_batch:
+            yield dumps(o) + b"\n"
+        try:
+            async for o in cursor:
+                yield dumps(o) + b"\n"
+        except PyMongoError:
+            # Headers are already sent; log it and end with an error record so
+            # clients can tell a cut-off list from a complete one.
+            logger.exception("Order list stream aborted")
+            yield dumps({"error": "Order stream interrupted"}) + b"\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
 
 class UpdateStatusBody(BaseModel):
     status: str
 
-@app.patch("/api/admin/orders/{oid}/status")
-def update_order_status(oid: str, body: UpdateStatusBody, admin=Depends(require_admin)):
-    try:
-        _id = ObjectId(oid)
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid ID")
-    db["order"].update_one({"_id": _id}, {"$set": {"status": body.status}})
+@app.patch("/api/admin/orders/{doc_id}/status")
+async def update_order_status(body: UpdateStatusBody, admin=Depends(require_admin), _id: ObjectId = Depends(object_id)):
+    await db["order"].update_one({"_id": _id}, {"$set": {"status": body.status}})
     return {"updated": True}
@@ -3,7 +3,7 @@ Database Schemas for Handestiy E-commerce
 
 Each Pydantic model represents a collection in MongoDB. The collection name is the lowercase of the class name.
 """
-from pydantic import BaseModel, Field, EmailStr
+from pydantic import BaseModel, ConfigDict, Field, EmailStr
 from typing import List, Optional, Literal
 from datetime import datetime
 
@@ -14,6 +14,8 @@ class Category(BaseModel):
     active: bool = Field(True, description="Whether the category is visible")
 
 class Product(BaseModel):
+    model_config = ConfigDict(extra="forbid", str_strip_whitespace=True, validate_assignment=False)
+
     title: str = Field(..., description="Product title")
     slug: str = Field(..., description="URL slug")
     short_description: Optional[str] = Field(None, description="Short description")
@@ -41,6 +43,8 @@ class CustomerInfo(BaseModel):
     address: str
 
 class Order(BaseModel):
+    model_config = ConfigDict(extra="forbid", str_strip_whitespace=True, validate_assignment=False)
+
     items: List[OrderItem]
     subtotal: float
     shipping: float
@@ -15,5 +15,11 @@ mkdir -p logs
 echo "Installing dependencies..."
 pip install -r requirements.txt
 echo "Starting FastAPI server..."
-nohup uvicorn main:app --host 0.0.0.0 --port 8000 --reload > logs/server.log 2>&1 
+# uvloop + httptools. Token, category and login-throttle caches live in-process,
+# so stay on one worker until they move to a shared store; raise WEB_CONCURRENCY
+# only if up to 60s of cross-worker staleness is acceptable.
+nohup uvicorn main:app --host 0.0.0.0 --port 8000 \
+  --workers "${WEB_CONCURRENCY:-1}" --loop uvloop --http httptools \
+  --proxy-headers --forwarded-allow-ips "${FORWARDED_ALLOW_IPS:-127.0.0.1}" \
+  --log-level warning --no-access-log > logs/server.log 2>&1 
 echo "Server started in background"